@@ -2,10 +2,13 @@ import numpy as np
 import matplotlib.pyplot as plt
 from abc import ABC, abstractmethod
 from scipy import signal
-from scipy.fft import fft
+from scipy.fft import rfft, next_fast_len
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
 import pywt
 from datetime import datetime
 import os
+import warnings
 import networkx as nx  
 from pathlib import Path
 
@@ -17,77 +20,103 @@ class DataLoader(ABC):
 class TransactionData:
     
     def __init__(self, raw_data, data_type):
-        self.__transactions = []
-        self.__timestamps = []
-        self.__amounts = []
-        self.__data_type = data_type  
+        self.__timestamps = np.empty(0, dtype=np.float64)
+        self.__amounts = np.empty(0, dtype=np.float64)
+        self.__signal_amounts = None
+        self.__sources = np.empty(0, dtype=str)
+        self.__targets = np.empty(0, dtype=str)
+        self.__claim_dates = np.empty(0, dtype=str)
+        self.__data_type = data_type
+        self.__graph = None
+        self.__matrix = None
         self.__parse_data(raw_data)
-    
+
     def __parse_data(self, raw_data):
-        for line in raw_data:
-            if not line.strip():  
-                continue
-            parts = line.strip().split(',')
-            if self.__data_type == "credit_card":
-                timestamp = float(parts[0])
-                amount = float(parts[1])
-                merchant = parts[2]
-                card_id = parts[3]
-                
-                self.__timestamps.append(timestamp)
-                self.__amounts.append(amount)
-                self.__transactions.append({
-                    'timestamp': timestamp,
-                    'amount': amount,
-                    'merchant': merchant,
-                    'card_id': card_id
-                })
-            elif self.__data_type == "insurance":
-
-                claim_date = parts[0]
-                claim_amount = float(parts[1])
-                policy_id = parts[2]
-                claim_type = parts[3]
-                
-                self.__timestamps.append(self._convert_date_to_timestamp(claim_date))
-                self.__amounts.append(claim_amount)
-                self.__transactions.append({
-                    'claim_date': claim_date,
-                    'claim_amount': claim_amount,
-                    'policy_id': policy_id,
-                    'claim_type': claim_type
-                })
-    
-    def _convert_date_to_timestamp(self, date_str):
+        # genfromtxt consumes any iterable of lines (an open file included)
+        # and skips blank lines itself; it only warns on empty input.
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", message="genfromtxt: Empty input file")
+            # No comment character ('#' is valid in merchant names) and only the first
+            # four fields, so rows with trailing extras load like the old split(',').
+            columns = np.genfromtxt(raw_data, delimiter=',', dtype=str, encoding='utf-8',
+                                    autostrip=True, ndmin=2, comments=None, usecols=range(4))
+        if columns.shape[0] == 0:
+            return
+        if self.__data_type == "credit_card":
+            self.__timestamps = columns[:, 0].astype(np.float64)
+            self.__amounts = columns[:, 1].astype(np.float64)
+            self.__targets = columns[:, 2]
+            self.__sources = columns[:, 3]
+        elif self.__data_type == "insurance":
+            self.__claim_dates = columns[:, 0]
+            try:
+                days = self.__claim_dates.astype('datetime64[D]')
+            except ValueError:
+                # The bulk cast only takes zero-padded ISO dates; fall back to
+                # strptime for files with dates such as "2023-5-20".
+                days = np.array([datetime.strptime(date, "%Y-%m-%d").date()
+                                 for date in self.__claim_dates.tolist()], dtype='datetime64[D]')
+            self.__timestamps = (days.view(np.int64) * 86400).astype(np.float64)
+            self.__amounts = columns[:, 1].astype(np.float64)
+            self.__sources = columns[:, 2]
+            self.__targets = columns[:, 3]
 
-        dt = datetime.strptime(date_str, "%Y-%m-%d")
-        return dt.timestamp()
-        
     def get_time_series(self):
         return self.__timestamps, self.__amounts
+
+    def get_signal_series(self):
+        # Single-precision copy of the amounts for the FFT, wavelet and z-score
+        # passes; records and graph weights keep the float64 originals.
+        if self.__signal_amounts is None:
+            self.__signal_amounts = self.__amounts.astype(np.float32)
+        return self.__timestamps, self.__signal_amounts
     
     def get_transactions(self):
-        return self.__transactions.copy()
+        columns = (self.__timestamps.tolist(), self.__amounts.tolist(),
+                   self.__sources.tolist(), self.__targets.tolist())
+        if self.__data_type == "credit_card":
+            return [
+                {'timestamp': timestamp, 'amount': amount, 'merchant': merchant, 'card_id': card_id}
+                for timestamp, amount, card_id, merchant in zip(*columns)
+            ]
+        elif self.__data_type == "insurance":
+            claim_dates = self.__claim_dates.tolist()
+            return [
+                {'claim_date': claim_date, 'claim_amount': claim_amount,
+                 'policy_id': policy_id, 'claim_type': claim_type}
+                for claim_date, claim_amount, policy_id, claim_type in zip(claim_dates, *columns[1:])
+            ]
+        return []
     
     def get_transaction_count(self):
-        return len(self.__transactions)
+        return len(self.__amounts)
         
     def get_data_type(self):
         return self.__data_type
     
     def build_transaction_graph(self):
-        G = nx.DiGraph()
-        if self.__data_type == "credit_card":
-            for txn in self.__transactions:
-                G.add_edge(txn['card_id'], txn['merchant'], 
-                          weight=txn['amount'], 
-                          timestamp=txn['timestamp'])
-        elif self.__data_type == "insurance":
-            for claim in self.__transactions:
-                G.add_edge(claim['policy_id'], claim['claim_type'], 
-                          weight=claim['claim_amount'], 
-                          timestamp=self._convert_date_to_timestamp(claim['claim_date']))
-        return G
+        if self.__graph is None:
+            G = nx.DiGraph()
+            G.add_weighted_edges_from(zip(self.__sources.tolist(), self.__targets.tolist(),
+                                          self.__amounts.tolist()))
+            self.__graph = G
+        return self.__graph
+
+    def build_transaction_matrix(self):
+        if self.__matrix is None:
+            count = len(self.__amounts)
+            if count == 0:
+                self.__matrix = (None, [])
+                return self.__matrix
+            labels, codes = np.unique(np.concatenate([self.__sources, self.__targets]), return_inverse=True)
+            rows, cols = codes[:count], codes[count:]
+            # Keep the last weight for repeated edges, as DiGraph.add_edge does.
+            _, last = np.unique((rows * len(labels) + cols)[::-1], return_index=True)
+            last = count - 1 - last
+            matrix = csr_matrix((self.__amounts[last], (rows[last], cols[last])),
+                                shape=(len(labels), len(labels)))
+            self.__matrix = (matrix, labels.tolist())
+        return self.__matrix
 
 class TextFileLoader(DataLoader): 
     
@@ -97,13 +126,35 @@ class TextFileLoader(DataLoader):
     def load(self, file_path):
         try:
             with open(file_path, 'r') as file:
-                raw_data = file.readlines()
-            return TransactionData(raw_data, self.data_type)
+                return TransactionData(file, self.data_type)
         except Exception as e:
             print(f"Error loading file {file_path}: {e}")
             return None
 
 
+_MEAN_STD_CHUNK = 1 << 16
+
+
+def _mean_std(values):
+    n = len(values)
+    # Sums of (x - shift) and (x - shift)**2 in float64, one chunk at a time.
+    # Shifting by a sample keeps sum-of-squares from cancelling when the mean
+    # is large next to the spread. Python floats are returned so normalising
+    # a float32 array keeps it float32.
+    if n == 0:
+        return float('nan'), float('nan')
+    shift = float(values[0])
+    total = 0.0
+    total_sq = 0.0
+    for start in range(0, n, _MEAN_STD_CHUNK):
+        block = np.subtract(values[start:start + _MEAN_STD_CHUNK], shift, dtype=np.float64)
+        total += block.sum()
+        total_sq += np.dot(block, block)
+    offset = total / n
+    variance = max(total_sq / n - offset * offset, 0.0)
+    return float(shift + offset), float(np.sqrt(variance))
+
+
 class SignalProcessor(ABC): 
     
     @abstractmethod
@@ -118,12 +169,28 @@ class FFTProcessor(SignalProcessor):
     
     def __init__(self, sample_rate=1000):
         self.sample_rate = sample_rate
+        self._padded_key = None
+        self._padded = None
+
+    def _padded_buffer(self, n, dtype):
+        # Zero-padded input buffer for the last signal length seen, so repeated
+        # windows of one size reuse it. Shared state: process() is not thread-safe.
+        key = (n, dtype)
+        if self._padded_key != key:
+            self._padded = np.zeros(next_fast_len(n, real=True), dtype=dtype)
+            self._padded_key = key
+        return self._padded
     
     def process(self, data):
-        timestamps, amounts = data.get_time_series()
-        normalized_amounts = (amounts - np.mean(amounts)) / np.std(amounts)
-        spectrum = fft(normalized_amounts)
-        return np.abs(spectrum)
+        timestamps, amounts = data.get_signal_series()
+        padded = self._padded_buffer(len(amounts), np.result_type(amounts, np.float32))
+        mean, std = _mean_std(amounts)
+        normalized_amounts = padded[:len(amounts)]
+        np.subtract(amounts, mean, out=normalized_amounts)
+        np.divide(normalized_amounts, std, out=normalized_amounts)
+        spectrum = rfft(padded, workers=-1)
+        # rfft returns a fresh array, so its real part can hold the magnitude.
+        return np.abs(spectrum, out=spectrum.real)
     
     def get_name(self):
         return "Fast Fourier Transform"
@@ -134,12 +201,15 @@ class WaveletProcessor(SignalProcessor):
         self.level = level
     
     def process(self, data):
-        timestamps, amounts = data.get_time_series()
-        normalized_amounts = (amounts - np.mean(amounts)) / np.std(amounts)
-        coeffs = pywt.wavedec(normalized_amounts, self.wavelet_type, level=self.level)
-        filtered_coeffs = [coeffs[0]] + [None] * self.level
-        filtered_signal = pywt.waverec(filtered_coeffs, self.wavelet_type)
-        filtered_signal = filtered_signal[:len(normalized_amounts)]
+        timestamps, amounts = data.get_signal_series()
+        mean, std = _mean_std(amounts)
+        normalized_amounts = (amounts - mean) / std
+        wavelet = pywt.Wavelet(self.wavelet_type)
+        approximation = pywt.downcoef('a', normalized_amounts, wavelet, level=self.level)
+        filtered_signal = pywt.upcoef('a', approximation, wavelet, level=self.level)
+        # upcoef returns the full convolution; skip the filter tails waverec trims per level.
+        offset = (wavelet.dec_len - 2) * (2 ** self.level - 1)
+        filtered_signal = filtered_signal[offset:offset + len(normalized_amounts)]
         
         return filtered_signal
     
@@ -152,20 +222,25 @@ class FraudDetector(ABC):
     @abstractmethod
     def detect(self, processed_signal, raw_data):
         pass
-    
 
-class ThresholdDetector(FraudDetector): 
+
+def _zscore_anomalies(amounts, threshold):
+    mean, std = _mean_std(amounts)
+    z_scores = np.subtract(amounts, mean)
+    np.divide(z_scores, std, out=z_scores)
+    np.abs(z_scores, out=z_scores)
+    mask = z_scores > threshold
+    confidence_scores = z_scores[mask] / threshold
+    anomaly_indices = np.flatnonzero(mask)
+    return anomaly_indices, confidence_scores, z_scores
+
+class ThresholdDetector(FraudDetector):
     def __init__(self, threshold=2):
         self.threshold = threshold
 
     def detect(self, processed_signal, raw_data):
-        _, amounts = raw_data.get_time_series()
-        amounts = np.array(amounts)
-        mean = np.mean(amounts)
-        std = np.std(amounts)
-        z_scores = np.abs((amounts - mean) / std)
-        anomaly_indices = np.where(z_scores > self.threshold)[0]
-        confidence_scores = z_scores[anomaly_indices] / self.threshold
+        _, amounts = raw_data.get_signal_series()
+        anomaly_indices, confidence_scores, z_scores = _zscore_anomalies(amounts, self.threshold)
 
         return {
             'indices': anomaly_indices,
@@ -176,28 +251,56 @@ class ThresholdDetector(FraudDetector):
     def get_name(self):
         return f"Threshold Detector (threshold={self.threshold})"  
 
+def _walk_predecessors(predecessors, src, tgt):
+    path = [tgt]
+    while path[-1] != src:
+        path.append(predecessors[path[-1]])
+    path.reverse()
+    return path
+
 class GraphFraudDetector(FraudDetector): 
 
     def __init__(self, min_path_amount=5000):
         self.min_path_amount = min_path_amount
 
     def detect(self, processed_signal, raw_data):
+        matrix, nodes = raw_data.build_transaction_matrix()
+        found = []
+        if nodes:
+            out_degree = np.diff(matrix.indptr)
+            edge_sources = np.repeat(np.arange(len(nodes)), out_degree)
+            # Only nodes with an edge into another node that has outgoing edges can
+            # start a multi-edge path. Every other origin (e.g. a card that only pays
+            # merchants) has one-edge shortest paths, read straight off the matrix.
+            chained = np.unique(edge_sources[out_degree[matrix.indices] > 0])
+            direct = ~np.isin(edge_sources, chained) & (matrix.data > self.min_path_amount)
+            for src, tgt, total in zip(edge_sources[direct].tolist(), matrix.indices[direct].tolist(),
+                                       matrix.data[direct].tolist()):
+                found.append((src, tgt, total, [src, tgt]))
+            if len(chained):
+                dist_matrix, predecessors = dijkstra(matrix, directed=True, indices=chained,
+                                                     return_predecessors=True)
+                mask = np.isfinite(dist_matrix) & (dist_matrix > self.min_path_amount)
+                mask[np.arange(len(chained)), chained] = False
+                rows, targets = np.nonzero(mask)
+                totals = dist_matrix[rows, targets].tolist()
+                for row, tgt, total in zip(rows.tolist(), targets.tolist(), totals):
+                    src = int(chained[row])
+                    found.append((src, tgt, total, _walk_predecessors(predecessors[row], src, tgt)))
+            found.sort(key=lambda item: item[:2])
+        return {
+            'suspicious_paths': [([nodes[i] for i in path], total) for _, _, total, path in found]
+        }
+
+    def detect_between(self, raw_data, source, target):
         G = raw_data.build_transaction_graph()
         suspicious_paths = []
-        nodes = list(G.nodes)
-        for i in range(len(nodes)):
-            for j in range(i+1, len(nodes)):  
-                if i != j and nx.has_path(G, nodes[i], nodes[j]):
-                    try:
-                        path = nx.dijkstra_path(G, nodes[i], nodes[j], weight='weight')
-                        total = 0
-                        for k in range(len(path)-1):
-                            total += G[path[k]][path[k+1]]['weight']
-                            
-                        if total > self.min_path_amount:
-                            suspicious_paths.append((path, total))
-                    except nx.NetworkXNoPath:
-                        continue
+        try:
+            total, path = nx.bidirectional_dijkstra(G, source, target, weight='weight')
+            if total > self.min_path_amount:
+                suspicious_paths.append((path, total))
+        except (nx.NetworkXNoPath, nx.NodeNotFound):
+            pass
         return {
             'suspicious_paths': suspicious_paths
         }
@@ -233,9 +336,22 @@ class ProcessorFactory:
 
 class FraudVisualizer:
 
+    def __init__(self, annotation_limit=200):
+        self.annotation_limit = annotation_limit
+
+    def unannotated_scores(self, anomalies):
+        # Report lines for the scores visualize() leaves off the chart; draws nothing.
+        indices = anomalies.get('indices', [])
+        if 'scores' not in anomalies or len(indices) <= self.annotation_limit:
+            return []
+        lines = [f"{len(indices)} anomalies exceed the annotation limit "
+                 f"({self.annotation_limit}); confidence scores:"]
+        lines.extend(f"Transaction {idx}: {s:.2f}"
+                     for idx, s in zip(np.asarray(indices).tolist(), np.asarray(anomalies['scores']).tolist()))
+        return lines
+
     def visualize(self, raw_data, processed_signal, anomalies, processor, detector): 
         data_type = raw_data.get_data_type()
-        
 
         if isinstance(detector, GraphFraudDetector):
             self.visualize_graph_anomalies(raw_data, anomalies)
@@ -253,15 +369,19 @@ class FraudVisualizer:
             ax2.set_ylabel('Magnitude')
             ax3.plot(amounts, 'b-')
             if 'indices' in anomalies and len(anomalies['indices']) > 0:
-                anomaly_indices = anomalies['indices']
-                anomaly_amounts = [amounts[i] for i in anomaly_indices if i < len(amounts)]
+                in_range = np.asarray(anomalies['indices']) < len(amounts)
+                anomaly_indices = np.asarray(anomalies['indices'])[in_range]
+                anomaly_amounts = amounts[anomaly_indices]
                 ax3.scatter(anomaly_indices, anomaly_amounts, color='red', marker='o', 
                             s=100, label='Potential Fraud')
                 if 'scores' in anomalies:
-                    scores = anomalies['scores']
-                    for i, (idx, y, s) in enumerate(zip(anomaly_indices, anomaly_amounts, scores)):
-                        ax3.annotate(f"{s:.2f}", (idx, y), xytext=(10, 10), 
-                                    textcoords='offset points')
+                    scores = np.asarray(anomalies['scores'])[in_range]
+                    # One annotate() call per point is slow; past the limit the scores go to
+                    # the report instead (see unannotated_scores).
+                    if len(anomaly_indices) <= self.annotation_limit:
+                        for idx, y, s in zip(anomaly_indices, anomaly_amounts, scores):
+                            ax3.annotate(f"{s:.2f}", (idx, y), xytext=(10, 10), 
+                                        textcoords='offset points')
             
             ax3.set_title(f'Detected Fraud Anomalies using {detector.get_name()}')
             ax3.set_xlabel('Transaction Index')
@@ -299,43 +419,42 @@ class FraudVisualizer:
 
 class FraudAnalysisSystem: 
     
-    def __init__(self, data_loader, signal_processor, fraud_detector, visualizer): 
+    def __init__(self, data_loader, signal_processor, fraud_detector, visualizer, output_path=None): 
         self.data_loader = data_loader
         self.signal_processor = signal_processor
         self.fraud_detector = fraud_detector
         self.visualizer = visualizer
+        self.output_path = output_path
     
     def analyze(self, file_path):
         raw_data = self.data_loader.load(file_path)
         if raw_data is None:
             return None
         
-        script_dir = Path(__file__).parent
-        script_dir = Path.cwd()
-        output_path = script_dir / "info.txt"
+        output_path = self.output_path if self.output_path is not None else Path.cwd() / "info.txt"
+        processed_signal = None
+        report = []
    
         if isinstance(self.fraud_detector, GraphFraudDetector):
-            with open(output_path, "w") as f:
-                f.write(f"Loaded {raw_data.get_transaction_count()} transactions of type {raw_data.get_data_type()}\n")
-                f.write(f"Using graph-based detection with {self.fraud_detector.get_name()}\n")
-
-
+            report.append(f"Loaded {raw_data.get_transaction_count()} transactions of type {raw_data.get_data_type()}")
+            report.append(f"Using graph-based detection with {self.fraud_detector.get_name()}")
             anomalies = self.fraud_detector.detect(None, raw_data)
             suspicious_paths_count = len(anomalies.get('suspicious_paths', []))
-            with open(output_path, "w") as f:
-             f.write(f"Loaded {raw_data.get_transaction_count()} transactions of type {raw_data.get_data_type()}\n")
-             f.write(f"Detected {suspicious_paths_count} suspicious transaction paths")
+            report.append(f"Detected {suspicious_paths_count} suspicious transaction paths")
         else:
-
             processed_signal = self.signal_processor.process(raw_data)
-            with open(output_path, "w") as f:
-                f.write(f"Processed signal using {self.signal_processor.get_name()}\n")
-                anomalies = self.fraud_detector.detect(processed_signal, raw_data)
-                anomaly_count = len(anomalies.get('indices', []))
-                f.write(f"Detected {anomaly_count} potential fraud cases using {self.fraud_detector.get_name()}\n")
- 
+            report.append(f"Processed signal using {self.signal_processor.get_name()}")
+            anomalies = self.fraud_detector.detect(processed_signal, raw_data)
+            anomaly_count = len(anomalies.get('indices', []))
+            report.append(f"Detected {anomaly_count} potential fraud cases using {self.fraud_detector.get_name()}")
+            if isinstance(self.visualizer, FraudVisualizer):
+                report.extend(self.visualizer.unannotated_scores(anomalies))
+
+        with open(output_path, "w") as f:
+            f.write("\n".join(report) + "\n")
+
         self.visualizer.visualize(raw_data, 
-                                 self.signal_processor.process(raw_data) if not isinstance(self.fraud_detector, GraphFraudDetector) else None,
+                                 processed_signal,
                                  anomalies, 
                                  self.signal_processor, 
                                  self.fraud_detector)
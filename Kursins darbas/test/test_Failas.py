@@ -1,9 +1,12 @@
 import sys
 import os
+import tempfile
 import unittest
+from unittest import mock
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import networkx as nx
-from Failas import DetectorFactory, ProcessorFactory, ThresholdDetector, GraphFraudDetector, TransactionData, FFTProcessor, np, WaveletProcessor
+import pywt
+from Failas import DetectorFactory, ProcessorFactory, FraudAnalysisSystem, FraudVisualizer, TextFileLoader, plt, ThresholdDetector, GraphFraudDetector, TransactionData, FFTProcessor, np, WaveletProcessor, _mean_std
 class TestTransactionData(unittest.TestCase):
     def setUp(self):
         self.credit_data = [
@@ -31,6 +34,47 @@ class TestTransactionData(unittest.TestCase):
         self.assertEqual(len(ts), 2)
         self.assertEqual(td.get_transactions()[1]['claim_type'], "Fire")
 
+    def test_time_series_arrays(self):
+        td = TransactionData(self.insurance_data, "insurance")
+        ts, am = td.get_time_series()
+        self.assertIsInstance(ts, np.ndarray)
+        self.assertIsInstance(am, np.ndarray)
+        self.assertEqual(ts[0], 1622505600.0)
+        self.assertEqual(am[1], 2500.0)
+
+    def test_blank_lines_and_empty_input(self):
+        td = TransactionData(["", "  "] + self.credit_data + ["\n"], "credit_card")
+        self.assertEqual(td.get_transaction_count(), 3)
+        empty = TransactionData([], "credit_card")
+        self.assertEqual(empty.get_transaction_count(), 0)
+        self.assertEqual(empty.get_transactions(), [])
+
+    def test_hash_in_field_is_not_a_comment(self):
+        td = TransactionData(["1622505600,100.0,Store #12,1234"] + self.credit_data, "credit_card")
+        self.assertEqual(td.get_transaction_count(), 4)
+        self.assertEqual(td.get_transactions()[0]['merchant'], "Store #12")
+        self.assertEqual(td.get_transactions()[0]['card_id'], "1234")
+
+    def test_extra_trailing_fields_are_ignored(self):
+        td = TransactionData(["1622505600,100.0,Amazon,1234,extra"] + self.credit_data, "credit_card")
+        self.assertEqual(td.get_transaction_count(), 4)
+        self.assertEqual(td.get_transactions()[0]['card_id'], "1234")
+
+    def test_amounts_keep_full_precision(self):
+        td = TransactionData(["1622505600,100.1,Amazon,1234", "1622509200,1234567.89,Apple,1234"], "credit_card")
+        self.assertEqual(td.get_transactions()[0]['amount'], 100.1)
+        self.assertEqual(td.get_transactions()[1]['amount'], 1234567.89)
+        _, signal_amounts = td.get_signal_series()
+        self.assertEqual(signal_amounts.dtype, np.float32)
+
+    def test_unpadded_insurance_dates(self):
+        td = TransactionData(["2021-6-1,500.0,POL123,Theft"] + self.insurance_data, "insurance")
+        ts, _ = td.get_time_series()
+        self.assertEqual(ts[0], 1622505600.0)
+        self.assertEqual(ts[1], 1622505600.0)
+        self.assertEqual(td.get_transactions()[0]['claim_date'], "2021-6-1")
+        self.assertEqual(td.get_transactions()[1]['claim_date'], "2021-06-01")
+
     def test_data_type(self):
         td = TransactionData(self.credit_data, "credit_card")
         self.assertEqual(td.get_data_type(), "credit_card")
@@ -42,6 +86,12 @@ class TestTransactionData(unittest.TestCase):
         self.assertTrue(G.has_edge('1234', 'Apple'))
         self.assertTrue(G.has_edge('5678', 'Amazon'))
 
+    def test_graph_is_cached(self):
+        td = TransactionData(self.insurance_data, "insurance")
+        G = td.build_transaction_graph()
+        self.assertIs(td.build_transaction_graph(), G)
+        self.assertEqual(G['POL456']['Fire']['weight'], 2500.0)
+
 class TestProcessors(unittest.TestCase):
     def setUp(self):
         credit_data = [
@@ -55,7 +105,40 @@ class TestProcessors(unittest.TestCase):
         proc = FFTProcessor()
         spectrum = proc.process(self.td)
         self.assertIsInstance(spectrum, np.ndarray)
-        self.assertEqual(len(spectrum), 3)
+        self.assertEqual(len(spectrum), 3 // 2 + 1)
+
+    def test_fft_processor_magnitude(self):
+        spectrum = FFTProcessor().process(self.td)
+        _, amounts = self.td.get_time_series()
+        normalized = (amounts - np.mean(amounts)) / np.std(amounts)
+        np.testing.assert_allclose(spectrum, np.abs(np.fft.rfft(normalized)), rtol=1e-5, atol=1e-6)
+
+    def test_fft_processor_reuses_padded_buffer(self):
+        proc = FFTProcessor()
+        first = proc.process(self.td)
+        expected = first.copy()
+        buffer = proc._padded
+        second = proc.process(self.td)
+        self.assertIs(proc._padded, buffer)
+        self.assertIsNot(first, second)
+        np.testing.assert_array_equal(first, expected)
+        np.testing.assert_array_equal(first, second)
+
+    def test_fft_processor_keeps_one_padded_buffer(self):
+        proc = FFTProcessor()
+        longer = TransactionData([f"{1622505600 + i},{a},Amazon,1234" for i, a in enumerate([8.0, 1.0, 5.0, 2.0, 7.0])],
+                                 "credit_card")
+        proc.process(self.td)
+        spectrum = proc.process(longer)
+        self.assertEqual(proc._padded_key[0], 5)
+        np.testing.assert_allclose(spectrum, FFTProcessor().process(longer))
+        np.testing.assert_allclose(proc.process(self.td), FFTProcessor().process(self.td))
+
+    def test_fft_processor_pads_to_fast_length(self):
+        amounts = [100.0, 250.0, 50.0, 75.0, 300.0, 20.0, 5000.0]
+        td = TransactionData([f"{1622505600 + i},{a},Amazon,1234" for i, a in enumerate(amounts)], "credit_card")
+        spectrum = FFTProcessor().process(td)
+        self.assertEqual(len(spectrum), 8 // 2 + 1)
 
     def test_wavelet_processor(self):
         proc = WaveletProcessor(level=1)
@@ -63,6 +146,31 @@ class TestProcessors(unittest.TestCase):
         self.assertIsInstance(filtered, np.ndarray)
         self.assertEqual(len(filtered), 3)
 
+    def test_wavelet_processor_matches_waverec(self):
+        amounts = np.random.default_rng(0).normal(1000.0, 300.0, size=200)
+        td = TransactionData([f"{1622505600 + i},{a},Amazon,1234" for i, a in enumerate(amounts)], "credit_card")
+        filtered = WaveletProcessor(level=3).process(td)
+        normalized = (amounts - np.mean(amounts)) / np.std(amounts)
+        coeffs = pywt.wavedec(normalized, 'db4', level=3)
+        expected = pywt.waverec([coeffs[0]] + [None] * 3, 'db4')[:len(amounts)]
+        np.testing.assert_allclose(filtered, expected, rtol=1e-5, atol=1e-6)
+
+    def test_mean_std_matches_numpy(self):
+        _, amounts = self.td.get_time_series()
+        mean, std = _mean_std(amounts)
+        self.assertAlmostEqual(mean, np.mean(amounts))
+        self.assertAlmostEqual(std, np.std(amounts))
+
+    def test_mean_std_large_mean_small_spread(self):
+        values = np.array([1e8 + 1, 1e8 - 1] * 1000)
+        mean, std = _mean_std(values)
+        self.assertEqual(mean, 1e8)
+        self.assertAlmostEqual(std, 1.0)
+        noisy = np.random.default_rng(0).normal(1e5, 0.01, size=200000).astype(np.float32)
+        mean, std = _mean_std(noisy)
+        self.assertAlmostEqual(mean, np.mean(noisy, dtype=np.float64), places=4)
+        self.assertAlmostEqual(std / np.std(noisy, dtype=np.float64), 1.0, places=6)
+
 class TestDetectors(unittest.TestCase):
     def setUp(self):
         credit_data = [
@@ -85,6 +193,46 @@ class TestDetectors(unittest.TestCase):
         result = detector.detect(None, self.td)
         self.assertIn('suspicious_paths', result)
 
+    def test_graph_detector_path_totals(self):
+        detector = GraphFraudDetector(min_path_amount=100)
+        result = detector.detect(None, self.td)
+        found = {tuple(path): total for path, total in result['suspicious_paths']}
+        self.assertEqual(found, {('1234', 'Apple'): 250.0, ('5678', 'Amazon'): 5000.0})
+
+    def test_graph_detector_multi_hop_path(self):
+        chained = TransactionData([
+            "1622505600,3000.0,B,A",
+            "1622509200,3000.0,C,B"
+        ], "credit_card")
+        detector = GraphFraudDetector(min_path_amount=5000)
+        result = detector.detect(None, chained)
+        self.assertEqual(result['suspicious_paths'], [(['A', 'B', 'C'], 6000.0)])
+
+    def test_graph_detector_keeps_amounts_just_over_limit(self):
+        td = TransactionData(["1622505600,5000.0001,Amazon,1234"], "credit_card")
+        result = GraphFraudDetector(min_path_amount=5000).detect(None, td)
+        self.assertEqual(result['suspicious_paths'], [(['1234', 'Amazon'], 5000.0001)])
+
+    def test_graph_detector_between_nodes(self):
+        chained = TransactionData([
+            "1622505600,3000.0,B,A",
+            "1622509200,3000.0,C,B"
+        ], "credit_card")
+        detector = GraphFraudDetector(min_path_amount=5000)
+        result = detector.detect_between(chained, 'A', 'C')
+        self.assertEqual(result['suspicious_paths'], [(['A', 'B', 'C'], 6000.0)])
+        self.assertEqual(detector.detect_between(chained, 'C', 'A')['suspicious_paths'], [])
+        self.assertEqual(detector.detect_between(chained, 'A', 'B')['suspicious_paths'], [])
+
+    def test_graph_detector_repeated_edge_keeps_last_weight(self):
+        repeated = TransactionData([
+            "1622505600,100.0,Amazon,1234",
+            "1622509200,300.0,Amazon,1234"
+        ], "credit_card")
+        detector = GraphFraudDetector(min_path_amount=200)
+        result = detector.detect(None, repeated)
+        self.assertEqual(result['suspicious_paths'], [(['1234', 'Amazon'], 300.0)])
+
 class TestFactory(unittest.TestCase):
     def test_detector_factory(self):
         d1 = DetectorFactory.create_detector('threshold', threshold=2)
@@ -102,5 +250,90 @@ class TestFactory(unittest.TestCase):
         with self.assertRaises(ValueError):
             ProcessorFactory.create_processor('unknown')
 
+class TestFraudAnalysisSystem(unittest.TestCase):
+    class RecordingVisualizer:
+        def visualize(self, raw_data, processed_signal, anomalies, processor, detector):
+            self.processed_signal = processed_signal
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.tmp.name, "transactions.txt")
+        self.output_path = os.path.join(self.tmp.name, "info.txt")
+        with open(self.input_path, "w") as f:
+            f.write("1622505600,100.0,Amazon,1234\n1622509200,250.0,Apple,1234\n1622512800,5000.0,Amazon,5678\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_graph_analysis_report(self):
+        system = FraudAnalysisSystem(TextFileLoader("credit_card"), FFTProcessor(),
+                                     GraphFraudDetector(min_path_amount=100),
+                                     self.RecordingVisualizer(), output_path=self.output_path)
+        system.analyze(self.input_path)
+        with open(self.output_path) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[0], "Loaded 3 transactions of type credit_card")
+        self.assertTrue(lines[1].startswith("Using graph-based detection"))
+        self.assertEqual(lines[2], "Detected 2 suspicious transaction paths")
+
+    def test_signal_analysis_report(self):
+        visualizer = self.RecordingVisualizer()
+        system = FraudAnalysisSystem(TextFileLoader("credit_card"), FFTProcessor(),
+                                     ThresholdDetector(threshold=1), visualizer,
+                                     output_path=self.output_path)
+        system.analyze(self.input_path)
+        with open(self.output_path) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[0], "Processed signal using Fast Fourier Transform")
+        self.assertTrue(lines[1].startswith("Detected 1 potential fraud cases"))
+        self.assertIsInstance(visualizer.processed_signal, np.ndarray)
+
+    def test_scores_over_annotation_limit_go_to_report(self):
+        system = FraudAnalysisSystem(TextFileLoader("credit_card"), FFTProcessor(),
+                                     ThresholdDetector(threshold=1), FraudVisualizer(annotation_limit=0),
+                                     output_path=self.output_path)
+        def show():
+            # The report must already be on disk while the chart window is open.
+            self.assertTrue(os.path.exists(self.output_path))
+
+        with mock.patch.object(plt, 'show', side_effect=show):
+            system.analyze(self.input_path)
+        plt.close('all')
+        with open(self.output_path) as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines[1].startswith("Detected 1 potential fraud cases"))
+        self.assertEqual(lines[2], "1 anomalies exceed the annotation limit (0); confidence scores:")
+        self.assertTrue(lines[3].startswith("Transaction 2: "))
+
+class TestFraudVisualizer(unittest.TestCase):
+    def setUp(self):
+        amounts = [100.0, 5000.0, 120.0, 4800.0, 90.0, 110.0]
+        self.td = TransactionData([f"{1622505600 + i},{a},Amazon,1234" for i, a in enumerate(amounts)], "credit_card")
+        self.detector = ThresholdDetector(threshold=0.5)
+        self.anomalies = self.detector.detect(None, self.td)
+
+    def tearDown(self):
+        plt.close('all')
+
+    def draw(self, visualizer):
+        with mock.patch.object(plt, 'show'):
+            visualizer.visualize(self.td, FFTProcessor().process(self.td), self.anomalies,
+                                 FFTProcessor(), self.detector)
+        return plt.gcf().axes[2]
+
+    def test_annotates_scores_under_limit(self):
+        visualizer = FraudVisualizer()
+        ax = self.draw(visualizer)
+        self.assertEqual(len(ax.texts), len(self.anomalies['indices']))
+        self.assertEqual(visualizer.unannotated_scores(self.anomalies), [])
+
+    def test_unannotated_scores_over_limit(self):
+        visualizer = FraudVisualizer(annotation_limit=1)
+        ax = self.draw(visualizer)
+        self.assertEqual(len(ax.texts), 0)
+        overflow = visualizer.unannotated_scores(self.anomalies)
+        self.assertEqual(len(overflow), len(self.anomalies['indices']) + 1)
+        self.assertTrue(overflow[2].startswith("Transaction 1: "))
+
 if __name__ == "__main__":
     unittest.main()